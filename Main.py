@@ -1,13 +1,29 @@
 import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, exists, select, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import joinedload, load_only, raiseload
 from dotenv import load_dotenv
 import gradio as gr
 import requests
-from contextlib import contextmanager
+from requests.adapters import HTTPAdapter, Retry
 from datetime import datetime
 import uuid
 import logging
+import functools
+import atexit
+import hashlib
+import json
+import queue
+import threading
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -17,16 +33,86 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# With DEBUG_ORM=1, any relationship access that wasn't eagerly loaded
+# raises instead of silently issuing an extra query, so N+1 regressions
+# show up in development rather than as latency in production.
+DEBUG_ORM = os.getenv('DEBUG_ORM') == '1'
+
+def _eager_options(*eager):
+    """Loader options for ORM queries: the requested eager loads, plus
+    raiseload("*") when DEBUG_ORM is on."""
+    opts = list(eager)
+    if DEBUG_ORM:
+        opts.append(raiseload("*"))
+    return opts
+
 # Initialize Flask app and SQLAlchemy
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///conversations.db')
+database_url = os.getenv('DATABASE_URL', 'sqlite:///conversations.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# Reuse warm pooled connections across Gradio callbacks instead of
+# re-establishing one per query. query_cache_size keeps the compiled SQL
+# for the small, high-frequency lookups (character fetch, history filter,
+# conversation insert) cached across calls instead of re-compiling the
+# ORM expression tree each time.
+engine_options = {
+    'pool_pre_ping': True,
+    'pool_recycle': 1800,
+    'query_cache_size': 1200,
+}
+if database_url.startswith('sqlite'):
+    # Gradio callbacks run on worker threads; allow the pooled SQLite
+    # connections to cross threads.
+    engine_options['connect_args'] = {'check_same_thread': False}
+else:
+    engine_options.update({'pool_size': 10, 'max_overflow': 20})
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+
+@event.listens_for(Engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Put SQLite in WAL mode so readers and writers don't serialize on
+    the conversations.db file."""
+    if database_url.startswith('sqlite'):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
 db = SQLAlchemy(app)
+logger.info("SQLAlchemy engine configured (query_cache_size=%s)",
+            engine_options['query_cache_size'])
 
 # Set Gemini API key
-gemini_api_key = 
+gemini_api_key = os.getenv('GEMINI_API_KEY')
 gemini_api_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
 
+# Shared HTTP session so repeated Gemini calls reuse the same pooled
+# TLS connection instead of paying a fresh TCP+TLS handshake per message.
+HEADERS = {'Content-Type': 'application/json'}
+REQUEST_TIMEOUT = (3.05, 30)  # (connect, read) so a stuck call can't pin a worker
+
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=0.2,
+                      status_forcelist=[429, 500, 502, 503, 504])
+))
+
+# (De)serialize Gemini payloads with orjson when it's available; it's
+# several times faster than the stdlib json used by requests.
+def _json_dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode()
+
+def _json_loads(response):
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
 # Database models
 class Character(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -34,9 +120,17 @@ class Character(db.Model):
     description = db.Column(db.Text, nullable=False)
     prompt_template = db.Column(db.Text, nullable=False)
 
+    conversations = db.relationship('Conversation', back_populates='character')
+
 class Conversation(db.Model):
     __tablename__ = 'conversation'
-    
+    # (chat_id, timestamp) turns the history fetch and the grouped chat
+    # listing into index range scans with no sort step.
+    __table_args__ = (
+        db.Index('ix_conversation_chat_ts', 'chat_id', 'timestamp'),
+        db.Index('ix_conversation_character', 'character_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     character_id = db.Column(db.Integer, db.ForeignKey('character.id'), nullable=False)
     user_input = db.Column(db.Text, nullable=True)
@@ -45,51 +139,54 @@ class Conversation(db.Model):
     chat_id = db.Column(db.String(36), nullable=True)
     user_id = db.Column(db.Integer, nullable=False)  # Added user_id
 
-@contextmanager
-def app_context():
-    with app.app_context():
-        yield
+    character = db.relationship('Character', back_populates='conversations')
+
+# Gradio invokes the callbacks on its own server and worker threads,
+# which don't inherit a context pushed at import time, so every DB
+# helper pushes its own app context (as _conversation_writer does) and
+# releases its thread-scoped session on the way out.
 
 def add_predefined_characters():
-    with app_context():
-        characters = [
-            {
-                "name": "Chuck the Clown",
-                "description": "A funny clown who tells jokes and entertains.",
-                "prompt_template": "You are Chuck the Clown, always ready with a joke and entertainment. Be upbeat, silly, and include jokes in your responses."
-            },
-            {
-                "name": "Sarcastic Pirate",
-                "description": "A pirate with a sharp tongue and a love for treasure.",
-                "prompt_template": "You are a Sarcastic Pirate, ready to share your tales of adventure. Use pirate slang, be witty, sarcastic, and mention your love for treasure and the sea."
-            },
-            {
-                "name": "Professor Sage",
-                "description": "A wise professor knowledgeable about many subjects.",
-                "prompt_template": "You are Professor Sage, sharing wisdom and knowledge. Be scholarly, thoughtful, and provide educational information in your responses."
-            }
-        ]
-
-        for char_data in characters:
-            if not Character.query.filter_by(name=char_data["name"]).first():
-                new_character = Character(
-                    name=char_data["name"],
-                    description=char_data["description"],
-                    prompt_template=char_data["prompt_template"]
-                )
-                db.session.add(new_character)
-                logger.info(f"Adding predefined character: {char_data['name']}")
-        
+    characters = [
+        {
+            "name": "Chuck the Clown",
+            "description": "A funny clown who tells jokes and entertains.",
+            "prompt_template": "You are Chuck the Clown, always ready with a joke and entertainment. Be upbeat, silly, and include jokes in your responses."
+        },
+        {
+            "name": "Sarcastic Pirate",
+            "description": "A pirate with a sharp tongue and a love for treasure.",
+            "prompt_template": "You are a Sarcastic Pirate, ready to share your tales of adventure. Use pirate slang, be witty, sarcastic, and mention your love for treasure and the sea."
+        },
+        {
+            "name": "Professor Sage",
+            "description": "A wise professor knowledgeable about many subjects.",
+            "prompt_template": "You are Professor Sage, sharing wisdom and knowledge. Be scholarly, thoughtful, and provide educational information in your responses."
+        }
+    ]
+
+    # One INSERT ... ON CONFLICT DO NOTHING for all rows instead of a
+    # SELECT existence probe plus INSERT per character on every startup.
+    stmt = sqlite_insert(Character.__table__).values(characters)
+    stmt = stmt.on_conflict_do_nothing(index_elements=['name'])
+
+    with app.app_context():
         try:
+            db.session.execute(stmt)
             db.session.commit()
+            _fetch_characters.cache_clear()
         except Exception as e:
             db.session.rollback()
             logger.error(f"Error adding predefined characters: {e}")
+        finally:
+            db.session.remove()
 
 def add_character(name, description, prompt_template):
-    with app_context():
+    with app.app_context():
         try:
-            if Character.query.filter_by(name=name).first():
+            # EXISTS returns a bare boolean instead of hydrating a full row
+            # just to test for a duplicate name.
+            if db.session.scalar(select(exists().where(Character.name == name))):
                 return f"Character '{name}' already exists!"
 
             new_character = Character(
@@ -99,36 +196,141 @@ def add_character(name, description, prompt_template):
             )
             db.session.add(new_character)
             db.session.commit()
+            _fetch_characters.cache_clear()
+            _get_character_prompt.cache_clear()
             logger.info(f"Successfully added character: {name}")
             return f"Character '{name}' added successfully!\nDescription: {description}"
-        
+
         except Exception as e:
             db.session.rollback()
             logger.error(f"Error adding character: {e}")
             return f"An error occurred while adding the character: {str(e)}"
+        finally:
+            db.session.remove()
+
+# The character table is tiny and mutated rarely, so cache the list and
+# invalidate on writes rather than re-querying on every render/refresh.
+@functools.lru_cache(maxsize=1)
+def _fetch_characters():
+    with app.app_context():
+        try:
+            rows = db.session.execute(
+                select(Character.id, Character.name, Character.description)).all()
+            return [(char_id, name, description) for char_id, name, description in rows]
+        finally:
+            db.session.remove()
 
 def get_existing_characters():
-    with app_context():
+    try:
+        return [(name, description) for _, name, description in _fetch_characters()]
+    except Exception as e:
+        logger.error(f"Error retrieving characters: {e}")
+        return [("Error retrieving characters", str(e))]
+
+def get_character_choices():
+    """(label, value) pairs for the chat dropdown, so callbacks receive
+    the integer primary key instead of a display name."""
+    try:
+        return [(name, char_id) for char_id, name, _ in _fetch_characters()]
+    except Exception as e:
+        logger.error(f"Error retrieving character choices: {e}")
+        return []
+
+# Conversations are persisted by a background thread so the reply
+# reaches the user without waiting on the commit (an fsync on SQLite);
+# queued rows are drained in batches to amortize per-commit overhead.
+WRITE_Q = queue.Queue()
+_WRITE_BATCH = 50
+
+def _conversation_writer():
+    while True:
+        rows = [WRITE_Q.get()]
         try:
-            characters = Character.query.all()
-            return [(char.name, char.description) for char in characters]
-        except Exception as e:
-            logger.error(f"Error retrieving characters: {e}")
-            return [("Error retrieving characters", str(e))]
+            while len(rows) < _WRITE_BATCH:
+                rows.append(WRITE_Q.get_nowait())
+        except queue.Empty:
+            pass
+
+        with app.app_context():
+            try:
+                db.session.bulk_insert_mappings(Conversation, rows)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Error persisting conversation batch: {e}")
+            finally:
+                db.session.remove()
+
+        for _ in rows:
+            WRITE_Q.task_done()
+
+threading.Thread(target=_conversation_writer, name='conversation-writer',
+                 daemon=True).start()
+
+@atexit.register
+def _flush_pending_writes():
+    # Let the writer drain anything still queued before the process exits.
+    WRITE_Q.join()
+
+# Chat traffic has a long tail of repeated prompts (greetings, "tell me
+# a joke", test messages); a short-lived response cache keyed on the
+# exact (prompt_template, user_input) pair skips the Gemini round trip
+# on a hit. History is still persisted per turn.
+_RESPONSE_CACHE = {}
+_RESPONSE_CACHE_TTL = 3600
+_RESPONSE_CACHE_MAX = 10000
+_RESPONSE_CACHE_LOCK = threading.Lock()
+
+def _response_cache_key(prompt_template, user_input):
+    return hashlib.blake2b(f"{prompt_template}\x00{user_input}".encode(),
+                           digest_size=16).hexdigest()
+
+def _response_cache_get(key):
+    with _RESPONSE_CACHE_LOCK:
+        entry = _RESPONSE_CACHE.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del _RESPONSE_CACHE[key]
+            return None
+        return value
+
+def _response_cache_set(key, value):
+    with _RESPONSE_CACHE_LOCK:
+        if len(_RESPONSE_CACHE) >= _RESPONSE_CACHE_MAX:
+            # Evict the oldest insertion; dict order makes this cheap.
+            _RESPONSE_CACHE.pop(next(iter(_RESPONSE_CACHE)))
+        _RESPONSE_CACHE[key] = (time.monotonic() + _RESPONSE_CACHE_TTL, value)
 
-def chat_with_character(character_name, user_input, user_id, chat_id=None):
-    with app_context():
+# A character's prompt_template is effectively immutable, so cache it
+# per process and skip the per-message SELECT entirely. Keyed by the
+# integer primary key: a single B-tree seek on a miss, an int hash on a
+# hit, instead of a string comparison per message.
+@functools.lru_cache(maxsize=256)
+def _get_character_prompt(character_id):
+    with app.app_context():
         try:
-            character = Character.query.filter_by(name=character_name).first()
-            
-            if not character:
-                return "Character not found.", None
-            
-            if not chat_id:
-                chat_id = str(uuid.uuid4())
-            
+            return db.session.scalar(
+                select(Character.prompt_template).filter_by(id=character_id))
+        finally:
+            db.session.remove()
+
+def chat_with_character(character_id, user_input, user_id, chat_id=None):
+    try:
+        prompt_template = _get_character_prompt(character_id)
+
+        if prompt_template is None:
+            return "Character not found.", None
+
+        if not chat_id:
+            chat_id = str(uuid.uuid4())
+
+        cache_key = _response_cache_key(prompt_template, user_input)
+        bot_response = _response_cache_get(cache_key)
+
+        if bot_response is None:
             # Include the character's prompt template in the payload
-            prompt_template = character.prompt_template
             full_prompt = f"{prompt_template}\nUser: {user_input}\nBot:"
 
             payload = {
@@ -137,81 +339,97 @@ def chat_with_character(character_name, user_input, user_id, chat_id=None):
                 }]
             }
 
-            headers = {
-                'Content-Type': 'application/json'
-            }
-
-            response = requests.post(
+            response = SESSION.post(
                 gemini_api_url,
-                headers=headers,
-                json=payload,
-                params={'key': gemini_api_key}
+                headers=HEADERS,
+                data=_json_dumps(payload),
+                params={'key': gemini_api_key},
+                timeout=REQUEST_TIMEOUT
             )
 
             # Check if the response was successful
             if response.status_code == 200:
-                response_data = response.json()
+                response_data = _json_loads(response)
                 # Ensure 'candidates' and the expected structure exist
                 if 'candidates' in response_data and len(response_data['candidates']) > 0:
                     bot_response = response_data['candidates'][0]['content']['parts'][0]['text']
-                    
-                    conversation = Conversation(
-                        character_id=character.id,
-                        user_input=user_input,
-                        bot_response=bot_response,
-                        chat_id=chat_id,
-                        user_id=user_id  # Include user_id here
-                    )
-                    db.session.add(conversation)
-                    db.session.commit()
-                    logger.info(f"Saved conversation with chat_id: {chat_id}")
-                    return bot_response, chat_id
+                    _response_cache_set(cache_key, bot_response)
                 else:
                     logger.error(f"Unexpected response structure: {response_data}")
                     return "An error occurred while generating content: Unexpected response format.", chat_id
             else:
-                logger.error(f"Error from Gemini API: {response.json()}")
+                logger.error(f"Error from Gemini API: {response.text}")
                 return f"An error occurred while generating content: {response.status_code} - {response.text}", chat_id
 
-        except Exception as e:
-            logger.error(f"Unexpected error in chat_with_character: {e}")
-            return f"An unexpected error occurred: {str(e)}", chat_id
+        WRITE_Q.put({
+            'character_id': character_id,
+            'user_input': user_input,
+            'bot_response': bot_response,
+            'chat_id': chat_id,
+            'user_id': user_id,
+            'timestamp': datetime.utcnow()
+        })
+        logger.info(f"Queued conversation with chat_id: {chat_id}")
+        return bot_response, chat_id
+
+    except Exception as e:
+        logger.error(f"Unexpected error in chat_with_character: {e}")
+        return f"An unexpected error occurred: {str(e)}", chat_id
 
 def get_chat_history(chat_id):
-    with app_context():
+    with app.app_context():
         try:
             if not chat_id:
                 return "No chat ID provided."
-            
-            conversations = Conversation.query.filter_by(chat_id=chat_id).order_by(Conversation.timestamp).all()
-            
+
+            # Eager-load the character in the same statement instead of a
+            # second Character.query.get round trip per history render, and
+            # restrict both entities to the columns the render actually uses
+            # (notably skipping the character's prompt_template blob).
+            conversations = Conversation.query.options(
+                *_eager_options(
+                    load_only(Conversation.timestamp, Conversation.user_input,
+                              Conversation.bot_response, Conversation.character_id),
+                    joinedload(Conversation.character).load_only(Character.name),
+                )
+            ).filter_by(chat_id=chat_id).order_by(Conversation.timestamp).all()
+
             if not conversations:
                 return "No chat history found for this ID."
-            
-            character = Character.query.get(conversations[0].character_id)
+
+            character = conversations[0].character
             character_name = character.name if character else "Unknown Character"
-            
-            history = f"Chat History with {character_name} (ID: {chat_id}):\n\n"
-            
+
+            # Collect the pieces and join once; += in the loop copies the
+            # whole string per turn, which goes quadratic on long chats.
+            parts = [f"Chat History with {character_name} (ID: {chat_id}):\n\n"]
+
             for conv in conversations:
-                timestamp = conv.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-                history += f"[{timestamp}]\n"
-                history += f"User: {conv.user_input}\n"
-                history += f"Bot: {conv.bot_response}\n\n"
-            
-            return history
-            
+                parts.append(
+                    f"[{conv.timestamp:%Y-%m-%d %H:%M:%S}]\n"
+                    f"User: {conv.user_input}\n"
+                    f"Bot: {conv.bot_response}\n\n"
+                )
+
+            return "".join(parts)
+
         except Exception as e:
             logger.error(f"Error retrieving chat history: {e}")
             return f"Error retrieving chat history: {str(e)}"
+        finally:
+            db.session.remove()
 
 def get_all_chat_ids():
-    with app_context():
+    with app.app_context():
         try:
+            # Format the start time in SQL and stream the grouped rows in
+            # batches so large chat tables aren't fully materialized (and
+            # re-formatted) in Python.
             query = db.session.query(
                 Conversation.chat_id,
                 Character.name.label('character_name'),
-                db.func.min(Conversation.timestamp).label('start_time'),
+                db.func.strftime('%Y-%m-%d %H:%M:%S',
+                                 db.func.min(Conversation.timestamp)).label('start_time'),
                 db.func.count(Conversation.id).label('message_count')
             ).join(
                 Character, Conversation.character_id == Character.id
@@ -221,23 +439,24 @@ def get_all_chat_ids():
                 Conversation.chat_id, Character.name
             ).order_by(
                 db.func.min(Conversation.timestamp).desc()
-            ).all()
-            
+            ).execution_options(stream_results=True).yield_per(500)
+
             chat_list = []
             for chat in query:
-                start_time = chat.start_time.strftime("%Y-%m-%d %H:%M:%S")
                 chat_list.append([
-                    chat.chat_id, 
-                    chat.character_name, 
-                    start_time, 
+                    chat.chat_id,
+                    chat.character_name,
+                    chat.start_time,
                     chat.message_count
                 ])
-            
+
             return chat_list
-            
+
         except Exception as e:
             logger.error(f"Error retrieving chat IDs: {e}")
             return [["Error", "Error retrieving chats", str(e), ""]]
+        finally:
+            db.session.remove()
 
 def update_database_schema():
     with app.app_context():
@@ -248,31 +467,44 @@ def update_database_schema():
                 db.create_all()
                 return
                 
-            columns = [col['name'] for col in inspector.get_columns('conversation')]
-            
+            columns = {col['name'] for col in inspector.get_columns('conversation')}
+            indexes = {ix['name'] for ix in inspector.get_indexes('conversation')}
+
+            # Allowlisted column DDL; column names are interpolated only
+            # from this mapping, never from external input.
+            needed_columns = {
+                'user_input': 'TEXT',
+                'chat_id': 'VARCHAR(36)',
+                'bot_response': 'TEXT NOT NULL DEFAULT ""',
+                'timestamp': 'DATETIME DEFAULT CURRENT_TIMESTAMP',
+                'user_id': 'INTEGER NOT NULL',
+            }
+            needed_indexes = {
+                'ix_conversation_chat_ts': 'conversation (chat_id, timestamp)',
+                'ix_conversation_character': 'conversation (character_id)',
+            }
+
+            missing_columns = needed_columns.keys() - columns
+            missing_indexes = needed_indexes.keys() - indexes
+            if not missing_columns and not missing_indexes:
+                # Steady state: nothing to alter, skip the DDL transaction.
+                return
+
             with db.engine.connect() as connection:
                 transaction = connection.begin()
                 try:
-                    if 'user_input' not in columns:
-                        logger.info("Adding missing 'user_input' column to conversation table...")
-                        connection.execute(text('ALTER TABLE conversation ADD COLUMN user_input TEXT'))
-                    
-                    if 'chat_id' not in columns:
-                        logger.info("Adding missing 'chat_id' column to conversation table...")
-                        connection.execute(text('ALTER TABLE conversation ADD COLUMN chat_id VARCHAR(36)'))
-                    
-                    if 'bot_response' not in columns:
-                        logger.info("Adding missing 'bot_response' column to conversation table...")
-                        connection.execute(text('ALTER TABLE conversation ADD COLUMN bot_response TEXT NOT NULL DEFAULT ""'))
-                    
-                    if 'timestamp' not in columns:
-                        logger.info("Adding missing 'timestamp' column to conversation table...")
-                        connection.execute(text('ALTER TABLE conversation ADD COLUMN timestamp DATETIME DEFAULT CURRENT_TIMESTAMP'))
-                    
-                    if 'user_id' not in columns:  # Check for user_id
-                        logger.info("Adding missing 'user_id' column to conversation table...")
-                        connection.execute(text('ALTER TABLE conversation ADD COLUMN user_id INTEGER NOT NULL'))  # Add user_id
-                    
+                    for column in sorted(missing_columns):
+                        logger.info(f"Adding missing '{column}' column to conversation table...")
+                        connection.execute(text(
+                            f'ALTER TABLE conversation ADD COLUMN {column} {needed_columns[column]}'))
+
+                    # Backfill indexes on databases created before they
+                    # were declared on the model.
+                    for index in sorted(missing_indexes):
+                        logger.info(f"Creating missing '{index}' index on conversation table...")
+                        connection.execute(text(
+                            f'CREATE INDEX IF NOT EXISTS {index} ON {needed_indexes[index]}'))
+
                     transaction.commit()
                     logger.info("Database schema is now up to date!")
                 except Exception as e:
@@ -283,12 +515,25 @@ def update_database_schema():
         except Exception as e:
             logger.error(f"Error updating database schema: {e}")
 
-def create_interface():
+def init_db():
+    """Create tables, reconcile the schema and seed characters, exactly once.
+
+    Both create_interface and __main__ used to run this work, doubling the
+    schema inspection and seed probes on every launch.
+    """
+    if getattr(app, "_initialized", False):
+        return
+    app._initialized = True
+
     with app.app_context():
-        db.create_all()  # Ensure tables are created
-        update_database_schema()  # Update schema if needed
-        add_predefined_characters()  # Add predefined characters
-    
+        db.create_all()
+        update_database_schema()
+        add_predefined_characters()
+    logger.info("Database setup completed successfully")
+
+def create_interface():
+    init_db()
+
     with gr.Blocks(title="Character Chat System", theme=gr.themes.Default()) as iface:
         current_chat_id = gr.State(value=None)  # State to track the current chat ID
         
@@ -306,12 +551,6 @@ def create_interface():
                     add_character_btn = gr.Button("Add Character", elem_id="add_character_btn", variant="primary")
                     add_character_response = gr.Textbox(label="Response", interactive=False, elem_id="response_output")
 
-                    add_character_btn.click(
-                        fn=add_character,
-                        inputs=[name_input, description_input, prompt_input],
-                        outputs=[add_character_response]
-                    )
-                    
                 with gr.Column():
                     gr.Markdown("## 🌟 Existing Characters 🌟", elem_id="existing_chars_title")
                     existing_characters = get_existing_characters()
@@ -324,21 +563,20 @@ def create_interface():
                     )
                     
                     refresh_characters_btn = gr.Button("Refresh Character List")
-                    
+
                     def refresh_characters():
-                        return gr.update(value=get_existing_characters())
-                    
-                    refresh_characters_btn.click(
-                        fn=refresh_characters,
-                        outputs=[character_list]
-                    )
+                        # One query feeds both the admin table and the chat
+                        # dropdown, which used to go stale until a reload.
+                        chars = get_existing_characters()
+                        return (gr.update(value=chars),
+                                gr.update(choices=get_character_choices()))
         
         with gr.Tab("Chat with Character"):
             with gr.Row():
                 with gr.Column():
                     character_dropdown = gr.Dropdown(
-                        label="Choose Character", 
-                        choices=[char[0] for char in existing_characters],
+                        label="Choose Character",
+                        choices=get_character_choices(),
                         elem_id="character_dropdown"
                     )
                     
@@ -369,11 +607,11 @@ def create_interface():
                         elem_id="chat_response"
                     )
                     
-                    def handle_chat(character_name, message, user_id, chat_id):
-                        if not character_name:
+                    def handle_chat(character_id, message, user_id, chat_id):
+                        if character_id is None:
                             return "Please select a character first.", chat_id, chat_id
-                        
-                        response, new_chat_id = chat_with_character(character_name, message, user_id, chat_id)
+
+                        response, new_chat_id = chat_with_character(character_id, message, user_id, chat_id)
                         return response, new_chat_id, new_chat_id
                     
                     def start_new_chat():
@@ -460,11 +698,12 @@ def create_interface():
                     def check_api_status():
                         # Implement a simple test call to the Gemini API (if applicable)
                         try:
-                            response = requests.post(
+                            response = SESSION.post(
                                 gemini_api_url,
-                                headers={'Content-Type': 'application/json'},
-                                json={"contents": [{"parts": [{"text": "Hello"}]}]},
-                                params={'key': gemini_api_key}
+                                headers=HEADERS,
+                                data=_json_dumps({"contents": [{"parts": [{"text": "Hello"}]}]}),
+                                params={'key': gemini_api_key},
+                                timeout=REQUEST_TIMEOUT
                             )
                             if response.status_code == 200:
                                 return "✅ API connection successful! Gemini API is operational."
@@ -477,19 +716,40 @@ def create_interface():
                         fn=check_api_status,
                         outputs=[api_status_display]
                     )
-    
+
+        # Wired after all tabs exist so admin actions can also update the
+        # chat tab's character dropdown.
+        refresh_characters_btn.click(
+            fn=refresh_characters,
+            outputs=[character_list, character_dropdown]
+        )
+
+        add_character_btn.click(
+            fn=add_character,
+            inputs=[name_input, description_input, prompt_input],
+            outputs=[add_character_response]
+        ).then(
+            fn=refresh_characters,
+            outputs=[character_list, character_dropdown]
+        )
+
     return iface
 
 if __name__ == "__main__":
-    with app.app_context():
-        try:
-            db.create_all()
-            update_database_schema()
-            add_predefined_characters()
-            logger.info("Database setup completed successfully")
-        except Exception as e:
-            logger.error(f"Error during database setup: {e}")
+    try:
+        init_db()
+    except Exception as e:
+        logger.error(f"Error during database setup: {e}")
 
     chat_interface = create_interface()
     logger.info("Starting Gradio interface...")
-    chat_interface.launch(share=True)
+    # Chat turns spend nearly all their time blocked on the Gemini POST,
+    # so let the server keep many of them in flight instead of
+    # serializing users behind a handful of workers. Gradio 4/5 defaults
+    # every event to concurrency_limit=1 (queue() alone still serializes
+    # users); 3.x spells the same knob concurrency_count.
+    try:
+        chat_interface.queue(default_concurrency_limit=64)
+    except TypeError:
+        chat_interface.queue(concurrency_count=64)
+    chat_interface.launch(share=True, max_threads=64)
@@ -1,15 +1,56 @@
 import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
 from dotenv import load_dotenv
 import gradio as gr
 import requests
-from contextlib import contextmanager
-from datetime import datetime
+from requests.adapters import HTTPAdapter, Retry
+import asyncio
+import httpx
 import uuid
 import logging
+import functools
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional HTTP/2 support for the async Gemini client; plain httpx
+# installs don't ship the h2 package (it's the httpx[http2] extra).
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+# Optional semantic-cache dependencies; the exact-match tier works
+# without them.
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    np = None
+    SentenceTransformer = None
+
+# Optional fast WAV decode path; SpeechRecognition's wave parsing works
+# without it.
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+import io
+import subprocess
 import speech_recognition as sr
-from moviepy import VideoFileClip
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
@@ -21,13 +62,89 @@ load_dotenv()
 
 # Initialize Flask app and SQLAlchemy
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///conversations.db')
+database_url = os.getenv('DATABASE_URL', 'sqlite:///conversations.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# Explicit engine options: a compiled-statement cache so the repeated
+# character/conversation queries skip SQL re-compilation, plus pool
+# settings so concurrent Gradio callbacks reuse warm connections.
+engine_options = {'query_cache_size': 1200, 'pool_pre_ping': True,
+                  'pool_recycle': 1800}
+if database_url.startswith('sqlite'):
+    # Pooled SQLite connections are shared across Gradio worker threads.
+    engine_options['connect_args'] = {'check_same_thread': False}
+else:
+    engine_options.update({'pool_size': 10, 'max_overflow': 20})
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+
+@event.listens_for(Engine, "connect")
+def _sqlite_wal_on_connect(dbapi_connection, connection_record):
+    # WAL lets readers proceed while a writer commits, instead of
+    # serializing every request on the conversations.db lock.
+    if database_url.startswith('sqlite'):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
 db = SQLAlchemy(app)
 
 # Set Gemini API key
 gemini_api_key = "YOUR_API_KEY"  # Replace with your actual API key
+
+# How many previous turns of the current chat are sent to Gemini as
+# context. Unbounded history grows the prompt (and token cost) with
+# every turn and eventually trips TPM limits.
+CONTEXT_TURNS = 10
 gemini_api_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
+gemini_stream_url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:streamGenerateContent"
+
+# Constant query params, built once instead of a fresh dict per call.
+_PARAMS = {'key': gemini_api_key}
+_STREAM_PARAMS = {'key': gemini_api_key, 'alt': 'sse'}
+
+# Gemini payloads/bodies go through orjson when it's installed; it's
+# several times faster than the stdlib json on the nested response shape.
+def _json_dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode()
+
+def _json_loads(raw):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+# One pooled session for all Gemini traffic: keep-alive reuses the TLS
+# connection across chat turns instead of handshaking per message.
+SESSION = requests.Session()
+SESSION.headers.update({'Content-Type': 'application/json',
+                        'Connection': 'keep-alive'})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3,
+                      status_forcelist=[429, 500, 502, 503, 504])
+))
+
+# Chat handlers run async: one event loop multiplexes every in-flight
+# Gemini call over this client's pooled connections (HTTP/2 when the h2
+# extra is installed, HTTP/1.1 otherwise), so concurrency is no longer
+# capped by worker threads blocked in requests.post. Created lazily so
+# it binds to the serving event loop.
+_async_client = None
+
+def _get_async_client():
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(
+            http2=h2 is not None,
+            headers={'Content-Type': 'application/json'},
+            limits=httpx.Limits(max_connections=100,
+                                max_keepalive_connections=20),
+            timeout=60.0)
+    return _async_client
 
 # Database models
 class Character(db.Model):
@@ -38,58 +155,209 @@ class Character(db.Model):
 
 class Conversation(db.Model):
     __tablename__ = 'conversation'
-    
+    # Serves the "last K turns of this chat" context query as an index
+    # range scan instead of a full-table scan plus sort; (user_id,
+    # timestamp) covers the per-user history listing and chat_id the
+    # history lookups.
+    __table_args__ = (
+        db.Index('ix_conv_user_chat_ts', 'user_id', 'chat_id', 'timestamp'),
+        db.Index('ix_conv_user_ts', 'user_id', 'timestamp'),
+        db.Index('ix_conv_chat', 'chat_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     character_id = db.Column(db.Integer, db.ForeignKey('character.id'), nullable=False)
     user_input = db.Column(db.Text, nullable=True)
     bot_response = db.Column(db.Text, nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Stamped by the database for tables it created; the Python default
+    # stays as well because pre-existing conversations.db files were
+    # built from DDL without a DB-level default, and Core inserts against
+    # them would otherwise write NULL timestamps.
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow,
+                          server_default=db.func.now(), nullable=False)
     chat_id = db.Column(db.String(36), nullable=True)
     user_id = db.Column(db.Integer, nullable=False)
 
-@contextmanager
-def app_context():
-    with app.app_context():
-        yield
+class ResponseCache(db.Model):
+    """Persisted exact-match response cache entries, reloaded on startup
+    so a restart doesn't start from a cold cache."""
+    __tablename__ = 'response_cache'
+
+    key = db.Column(db.String(32), primary_key=True)
+    character_id = db.Column(db.Integer, db.ForeignKey('character.id'), nullable=False)
+    user_input = db.Column(db.Text, nullable=False)
+    bot_response = db.Column(db.Text, nullable=False)
+
+# Gradio invokes the handlers on its own event loop and worker threads,
+# which don't inherit a context pushed at import time, so every DB helper
+# pushes its own app context (as _save_conversation and _store_response
+# already do) and releases its thread-scoped session on the way out.
 
 def add_predefined_characters():
-    with app_context():
-        characters = [
-            {
-                "name": "Chuck the Clown",
-                "description": "A funny clown who tells jokes and entertains.",
-                "prompt_template": "You are Chuck the Clown, always ready with a joke and entertainment. Be upbeat, silly, and include jokes in your responses."
-            },
-            {
-                "name": "Sarcastic Pirate",
-                "description": "A pirate with a sharp tongue and a love for treasure.",
-                "prompt_template": "You are a Sarcastic Pirate, ready to share your tales of adventure. Use pirate slang, be witty, sarcastic, and mention your love for treasure and the sea."
-            },
-            {
-                "name": "Professor Sage",
-                "description": "A wise professor knowledgeable about many subjects.",
-                "prompt_template": "You are Professor Sage, sharing wisdom and knowledge. Be scholarly, thoughtful, and provide educational information in your responses."
-            }
-        ]
-
-        for char_data in characters:
-            if not Character.query.filter_by(name=char_data["name"]).first():
-                new_character = Character(
-                    name=char_data["name"],
-                    description=char_data["description"],
-                    prompt_template=char_data["prompt_template"]
-                )
-                db.session.add(new_character)
-                logger.info(f"Adding predefined character: {char_data['name']}")
-        
+    characters = [
+        {
+            "name": "Chuck the Clown",
+            "description": "A funny clown who tells jokes and entertains.",
+            "prompt_template": "You are Chuck the Clown, always ready with a joke and entertainment. Be upbeat, silly, and include jokes in your responses."
+        },
+        {
+            "name": "Sarcastic Pirate",
+            "description": "A pirate with a sharp tongue and a love for treasure.",
+            "prompt_template": "You are a Sarcastic Pirate, ready to share your tales of adventure. Use pirate slang, be witty, sarcastic, and mention your love for treasure and the sea."
+        },
+        {
+            "name": "Professor Sage",
+            "description": "A wise professor knowledgeable about many subjects.",
+            "prompt_template": "You are Professor Sage, sharing wisdom and knowledge. Be scholarly, thoughtful, and provide educational information in your responses."
+        }
+    ]
+
+    # Single upsert for all seed rows; the old per-character existence
+    # probe plus add() cost 2N round trips on every startup.
+    stmt = sqlite_insert(Character.__table__).values(characters)
+    stmt = stmt.on_conflict_do_nothing(index_elements=['name'])
+
+    with app.app_context():
         try:
+            db.session.execute(stmt)
             db.session.commit()
+            _invalidate_character_caches()
         except Exception as e:
             db.session.rollback()
             logger.error(f"Error adding predefined characters: {e}")
+        finally:
+            db.session.remove()
+
+# The character table is tiny and near-static, so character reads are
+# served from process-local caches instead of a SELECT per message.
+# CharacterRow is detached from the session on purpose: caching the ORM
+# instance would raise DetachedInstanceError once its session closes.
+CharacterRow = namedtuple('CharacterRow', ['id', 'prompt_template', 'prompt_prefix'])
+
+@functools.lru_cache(maxsize=256)
+def _get_character_row(name):
+    with app.app_context():
+        try:
+            character = Character.query.filter_by(name=name).first()
+            if character is None:
+                return None
+            # prompt_prefix is the fixed head of every prompt for this
+            # character, precomputed once so the hot path only joins the
+            # variable pieces.
+            return CharacterRow(character.id, character.prompt_template,
+                                character.prompt_template + "\n")
+        finally:
+            db.session.remove()
+
+# get_existing_characters feeds the admin table and dropdown; a short
+# TTL is enough since the admin tab also refreshes explicitly.
+_characters_cache = {'rows': None, 'expires': 0.0}
+_CHARACTERS_TTL = 30
+
+def _invalidate_character_caches():
+    _get_character_row.cache_clear()
+    _characters_cache['rows'] = None
+
+# --- Response cache -------------------------------------------------------
+# Chats re-ask similar questions constantly, so cached replies avoid the
+# full Gemini round trip. Two tiers: an exact-match LRU keyed on
+# (character_id, user_input), and an optional semantic tier that returns
+# the nearest previous reply when embedding cosine similarity clears
+# _SEMANTIC_THRESHOLD.
+
+_EXACT_CACHE = OrderedDict()
+_EXACT_CACHE_MAX = 4096
+_exact_lock = threading.Lock()
+
+_SEMANTIC_THRESHOLD = 0.95
+_embedder = None
+_sem_lock = threading.Lock()
+_sem_vecs = None    # unit-normalized float32 embedding matrix
+_sem_entries = []   # parallel list of (character_id, bot_response)
+
+def _response_cache_key(character_id, user_input):
+    return hashlib.blake2b(f"{character_id}\x00{user_input}".encode(),
+                           digest_size=16).hexdigest()
+
+def _embed(text_value):
+    global _embedder
+    if SentenceTransformer is None:
+        return None
+    if _embedder is None:
+        _embedder = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+    vec = _embedder.encode([text_value], normalize_embeddings=True)[0]
+    return vec.astype('float32')
+
+def _semantic_lookup(character_id, user_input):
+    if np is None or _sem_vecs is None or not _sem_entries:
+        return None
+    vec = _embed(user_input)
+    if vec is None:
+        return None
+    with _sem_lock:
+        # One dot product against the whole matrix; entries belonging to
+        # other characters are masked out.
+        sims = _sem_vecs @ vec
+        mask = np.fromiter((cid == character_id for cid, _ in _sem_entries),
+                           dtype=bool, count=len(_sem_entries))
+        sims = np.where(mask, sims, -1.0)
+        best = int(sims.argmax())
+        if sims[best] >= _SEMANTIC_THRESHOLD:
+            return _sem_entries[best][1]
+    return None
+
+def _cached_response(character_id, user_input):
+    key = _response_cache_key(character_id, user_input)
+    with _exact_lock:
+        if key in _EXACT_CACHE:
+            _EXACT_CACHE.move_to_end(key)
+            return _EXACT_CACHE[key]
+    return _semantic_lookup(character_id, user_input)
+
+def _store_response(character_id, user_input, bot_response):
+    global _sem_vecs
+    key = _response_cache_key(character_id, user_input)
+    with _exact_lock:
+        _EXACT_CACHE[key] = bot_response
+        _EXACT_CACHE.move_to_end(key)
+        while len(_EXACT_CACHE) > _EXACT_CACHE_MAX:
+            _EXACT_CACHE.popitem(last=False)
+
+    vec = _embed(user_input)
+    if vec is not None:
+        with _sem_lock:
+            _sem_vecs = vec[np.newaxis, :] if _sem_vecs is None \
+                else np.vstack((_sem_vecs, vec))
+            _sem_entries.append((character_id, bot_response))
+
+    # Persist the exact entry so restarts warm-start from the table.
+    # Runs on executor threads via asyncio.to_thread, so it pushes its
+    # own app context rather than relying on the module-level one.
+    with app.app_context():
+        try:
+            db.session.merge(ResponseCache(
+                key=key, character_id=character_id,
+                user_input=user_input, bot_response=bot_response))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error persisting response cache entry: {e}")
+
+def _warm_response_cache():
+    with app.app_context():
+        try:
+            for row in ResponseCache.query.all():
+                with _exact_lock:
+                    _EXACT_CACHE[row.key] = row.bot_response
+            logger.info(f"Warmed response cache with {len(_EXACT_CACHE)} entries")
+        except Exception as e:
+            logger.error(f"Error warming response cache: {e}")
+        finally:
+            db.session.remove()
+# --------------------------------------------------------------------------
 
 def add_character(name, description, prompt_template):
-    with app_context():
+    with app.app_context():
         try:
             if Character.query.filter_by(name=name).first():
                 return f"Character '{name}' already exists!"
@@ -101,118 +369,378 @@ def add_character(name, description, prompt_template):
             )
             db.session.add(new_character)
             db.session.commit()
+            _invalidate_character_caches()
             logger.info(f"Successfully added character: {name}")
             return f"Character '{name}' added successfully!\nDescription: {description}"
-        
+
         except Exception as e:
             db.session.rollback()
             logger.error(f"Error adding character: {e}")
             return f"An error occurred while adding the character: {str(e)}"
+        finally:
+            db.session.remove()
 
 def get_existing_characters():
-    with app_context():
+    now = time.monotonic()
+    if _characters_cache['rows'] is not None and now < _characters_cache['expires']:
+        return list(_characters_cache['rows'])
+    with app.app_context():
         try:
             characters = Character.query.all()
-            return [(char.name, char.description) for char in characters]
+            rows = [(char.name, char.description) for char in characters]
+            _characters_cache['rows'] = rows
+            _characters_cache['expires'] = now + _CHARACTERS_TTL
+            return list(rows)
         except Exception as e:
             logger.error(f"Error retrieving characters: {e}")
             return [("Error retrieving characters", str(e))]
+        finally:
+            db.session.remove()
 
-def chat_with_character(character_name, user_input, user_id, chat_id=None):
-    with app_context():
-        try:
-            character = Character.query.filter_by(name=character_name).first()
-            
-            if not character:
-                return "Character not found.", None
-            
-            if not chat_id:
-                chat_id = str(uuid.uuid4())
-            
-            # Retrieve previous conversations for context
-            previous_conversations = Conversation.query.filter_by(user_id=user_id).order_by(Conversation.timestamp).all()
-            context_prompt = " ".join([f"User: {conv.user_input}\nBot: {conv.bot_response}" for conv in previous_conversations])
-            prompt_template = character.prompt_template
-            full_prompt = f"{prompt_template}\n{context_prompt}\nUser: {user_input}\nBot:"
-
-            payload = {
-                "contents": [{
-                    "parts": [{"text": full_prompt}]
-                }]
-            }
-
-            headers = {
-                'Content-Type': 'application/json'
-            }
-
-            response = requests.post(
-                gemini_api_url,
-                headers=headers,
-                json=payload,
-                params={'key': gemini_api_key}
-            )
+async def chat_with_character(character_name, user_input, user_id, chat_id=None):
+    try:
+        character = _get_character_row(character_name)
+
+        if not character:
+            return "Character not found.", None
+
+        if not chat_id:
+            chat_id = str(uuid.uuid4())
+
+        cached = await asyncio.to_thread(_cached_response, character.id, user_input)
+        if cached is not None:
+            await asyncio.to_thread(_save_conversation, character.id,
+                                    user_input, cached, chat_id, user_id)
+            return cached, chat_id
+
+        # Retrieve only the last few turns of THIS chat for context.
+        # Fetching every row for the user grew the prompt quadratically
+        # and mixed unrelated conversations into it.
+        context_prompt = _build_context_prompt(user_id, chat_id)
+        full_prompt = "".join((character.prompt_prefix, context_prompt,
+                               "\nUser: ", user_input, "\nBot:"))
+
+        payload = {
+            "contents": [{
+                "parts": [{"text": full_prompt}]
+            }]
+        }
+
+        response = await _get_async_client().post(
+            gemini_api_url,
+            content=_json_dumps(payload),
+            params=_PARAMS
+        )
 
-            if response.status_code == 200:
-                response_data = response.json()
-                if 'candidates' in response_data and len(response_data['candidates']) > 0:
-                    bot_response = response_data['candidates'][0]['content']['parts'][0]['text']
-                    
-                    conversation = Conversation(
-                        character_id=character.id,
-                        user_input=user_input,
-                        bot_response=bot_response,
-                        chat_id=chat_id,
-                        user_id=user_id
-                    )
-                    db.session.add(conversation)
-                    db.session.commit()
-                    logger.info(f"Saved conversation with chat_id: {chat_id}")
-                    return bot_response, chat_id
-                else:
-                    return "An error occurred while generating content: Unexpected response format.", chat_id
+        if response.status_code == 200:
+            response_data = _json_loads(response.content)
+            if 'candidates' in response_data and len(response_data['candidates']) > 0:
+                bot_response = response_data['candidates'][0]['content']['parts'][0]['text']
+
+                # The commit fsync runs on a worker thread so the
+                # event loop keeps serving other chats.
+                await asyncio.to_thread(_store_response, character.id,
+                                        user_input, bot_response)
+                await asyncio.to_thread(_save_conversation, character.id,
+                                        user_input, bot_response,
+                                        chat_id, user_id)
+                return bot_response, chat_id
             else:
-                logger.error(f"Error from Gemini API: {response.json()}")
-                return f"An error occurred while generating content: {response.status_code} - {response.text}", chat_id
+                return "An error occurred while generating content: Unexpected response format.", chat_id
+        else:
+            logger.error(f"Error from Gemini API: {response.text}")
+            return f"An error occurred while generating content: {response.status_code} - {response.text}", chat_id
 
-        except Exception as e:
-            logger.error(f"Unexpected error in chat_with_character: {e}")
-            return f"An unexpected error occurred: {str(e)}", chat_id
+    except Exception as e:
+        logger.error(f"Unexpected error in chat_with_character: {e}")
+        return f"An unexpected error occurred: {str(e)}", chat_id
+
+def _build_context_prompt(user_id, chat_id):
+    """Last CONTEXT_TURNS turns of a chat as prompt text, selecting just
+    the two text columns instead of hydrating full Conversation rows."""
+    with app.app_context():
+        try:
+            rows = db.session.execute(
+                select(Conversation.user_input, Conversation.bot_response)
+                .where(Conversation.user_id == user_id,
+                       Conversation.chat_id == chat_id)
+                .order_by(Conversation.timestamp.desc())
+                .limit(CONTEXT_TURNS)).all()[::-1]
+        finally:
+            db.session.remove()
+    return "\n".join(f"User: {user_text}\nBot: {bot_text}"
+                     for user_text, bot_text in rows)
+
+def _save_conversation(character_id, user_input, bot_response, chat_id, user_id):
+    # Pushes its own app context so it can run on executor threads.
+    # Core insert instead of ORM add(): no instance construction, no
+    # unit-of-work flush or identity-map upkeep, and the same call takes
+    # a list of rows as an executemany for batched writes.
+    with app.app_context():
+        db.session.execute(Conversation.__table__.insert(), [{
+            'character_id': character_id,
+            'user_input': user_input,
+            'bot_response': bot_response,
+            'chat_id': chat_id,
+            'user_id': user_id,
+        }])
+        db.session.commit()
+        logger.info(f"Saved conversation with chat_id: {chat_id}")
+
+async def chat_with_character_stream(character_name, user_input, user_id, chat_id=None):
+    """Stream the bot reply, yielding (partial_response, chat_id) as SSE
+    chunks arrive so the UI shows text at time-to-first-token instead of
+    idling until the full body lands. Persists once, after the stream
+    closes."""
+    try:
+        character = _get_character_row(character_name)
+
+        if not character:
+            yield "Character not found.", None
+            return
+
+        if not chat_id:
+            chat_id = str(uuid.uuid4())
+
+        cached = await asyncio.to_thread(_cached_response, character.id, user_input)
+        if cached is not None:
+            yield cached, chat_id
+            await asyncio.to_thread(_save_conversation, character.id,
+                                    user_input, cached, chat_id, user_id)
+            return
+
+        context_prompt = _build_context_prompt(user_id, chat_id)
+        full_prompt = "".join((character.prompt_prefix, context_prompt,
+                               "\nUser: ", user_input, "\nBot:"))
+
+        payload = {
+            "contents": [{
+                "parts": [{"text": full_prompt}]
+            }]
+        }
+
+        client = _get_async_client()
+        bot_response = ""
+        async with client.stream(
+                "POST", gemini_stream_url,
+                content=_json_dumps(payload),
+                params=_STREAM_PARAMS) as response:
+
+            if response.status_code != 200:
+                body = (await response.aread()).decode(errors='replace')
+                logger.error(f"Error from Gemini API: {body}")
+                yield f"An error occurred while generating content: {response.status_code} - {body}", chat_id
+                return
+
+            async for line in response.aiter_lines():
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                try:
+                    chunk = _json_loads(data)
+                except ValueError:
+                    continue
+                candidates = chunk.get('candidates') or []
+                if not candidates:
+                    continue
+                for part in candidates[0].get('content', {}).get('parts', []):
+                    bot_response += part.get('text', '')
+                yield bot_response, chat_id
+
+        if bot_response:
+            await asyncio.to_thread(_store_response, character.id,
+                                    user_input, bot_response)
+            await asyncio.to_thread(_save_conversation, character.id,
+                                    user_input, bot_response,
+                                    chat_id, user_id)
 
-def speech_to_text(audio_file):
-    """Convert audio file to text using SpeechRecognition."""
+    except Exception as e:
+        logger.error(f"Unexpected error in chat_with_character_stream: {e}")
+        yield f"An unexpected error occurred: {str(e)}", chat_id
+
+# Speech recognition blocks on audio decoding plus the Google STT call;
+# running it in a process pool keeps the event loop responsive and lets
+# transcriptions for concurrent users run in parallel despite the GIL.
+# Created on first use so importing the module doesn't spawn workers.
+_STT_POOL = None
+_stt_pool_lock = threading.Lock()
+
+def _get_stt_pool():
+    global _STT_POOL
+    with _stt_pool_lock:
+        if _STT_POOL is None:
+            _STT_POOL = ProcessPoolExecutor(max_workers=os.cpu_count())
+        return _STT_POOL
+
+async def _transcribe(audio_source):
+    """speech_to_text in the STT pool; audio_source must be a path or
+    raw bytes so it can cross the process boundary."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_stt_pool(), speech_to_text, audio_source)
+
+def batch_chat(character_name, requests_list, poll_interval=30):
+    """Run many prompts through Gemini Batch Mode in one submission.
+
+    For non-interactive work (history replay, bulk tests, evaluating an
+    edited prompt_template) synchronous one-by-one calls pay full price
+    and burn through RPM caps; batch mode runs at half price with much
+    higher throughput. requests_list is a list of
+    (chat_id, user_id, user_input) tuples; replies are persisted to
+    Conversation like normal turns and returned as (chat_id, response)
+    pairs.
+
+    Requires the optional google-genai package.
+    """
+    try:
+        from google import genai
+    except ImportError as e:
+        raise RuntimeError(
+            "Gemini batch mode requires the google-genai package") from e
+
+    character = _get_character_row(character_name)
+    if not character:
+        logger.error(f"batch_chat: character '{character_name}' not found")
+        return []
+
+    client = genai.Client(api_key=gemini_api_key)
+    inline_requests = [
+        {"contents": [{
+            "role": "user",
+            "parts": [{"text": "".join((character.prompt_prefix,
+                                        "User: ", user_input, "\nBot:"))}]
+        }]}
+        for _, _, user_input in requests_list
+    ]
+
+    job = client.batches.create(model="gemini-2.0-flash",
+                                src=inline_requests)
+    terminal_states = {'JOB_STATE_SUCCEEDED', 'JOB_STATE_FAILED',
+                       'JOB_STATE_CANCELLED'}
+    while job.state.name not in terminal_states:
+        time.sleep(poll_interval)
+        job = client.batches.get(name=job.name)
+
+    if job.state.name != 'JOB_STATE_SUCCEEDED':
+        logger.error(f"Batch job {job.name} ended in state {job.state.name}")
+        return []
+
+    results = []
+    rows = []
+    for (chat_id, user_id, user_input), inline in zip(
+            requests_list, job.dest.inlined_responses):
+        bot_response = inline.response.text
+        rows.append({'character_id': character.id,
+                     'user_input': user_input,
+                     'bot_response': bot_response,
+                     'chat_id': chat_id,
+                     'user_id': user_id})
+        results.append((chat_id, bot_response))
+    if rows:
+        # One executemany + commit for the whole job instead of a
+        # flush per reply.
+        with app.app_context():
+            try:
+                db.session.execute(Conversation.__table__.insert(), rows)
+                db.session.commit()
+            finally:
+                db.session.remove()
+    return results
+
+def speech_to_text(audio_source):
+    """Convert audio to text using SpeechRecognition.
+
+    Accepts a filesystem path, raw WAV bytes, or a file-like object, so
+    audio extracted from video stays in memory end to end and concurrent
+    requests never contend on a shared temp file.
+    """
     recognizer = sr.Recognizer()
-    with sr.AudioFile(audio_file) as source:
-        audio_data = recognizer.record(source)
+    if isinstance(audio_source, bytes):
+        audio_source = io.BytesIO(audio_source)
+
+    audio_data = None
+    if soundfile is not None and hasattr(audio_source, 'read'):
+        # In-memory WAV from ffmpeg (known mono/16-bit): decode the PCM
+        # with libsndfile straight into an int16 buffer instead of going
+        # through SpeechRecognition's pure-Python wave parsing.
         try:
-            return recognizer.recognize_google(audio_data)
-        except sr.UnknownValueError:
-            logger.error("Could not understand audio")
-            return None
-        except sr.RequestError as e:
-            logger.error(f"Could not request results from Google Speech Recognition service; {e}")
-            return None
+            samples, sample_rate = soundfile.read(audio_source, dtype='int16')
+            audio_data = sr.AudioData(samples.tobytes(), sample_rate, 2)
+        except Exception as e:
+            logger.warning(f"soundfile decode failed, falling back to wave parsing: {e}")
+            audio_source.seek(0)
+
+    if audio_data is None:
+        with sr.AudioFile(audio_source) as source:
+            audio_data = recognizer.record(source)
+
+    try:
+        return recognizer.recognize_google(audio_data)
+    except sr.UnknownValueError:
+        logger.error("Could not understand audio")
+        return None
+    except sr.RequestError as e:
+        logger.error(f"Could not request results from Google Speech Recognition service; {e}")
+        return None
 
 def extract_audio_from_video(video_file):
-    """Extract audio from video and return the audio file path."""
-    audio_file_path = "temp_audio.wav"  # Temporary file name
+    """Extract mono 16 kHz WAV audio from a video as an in-memory buffer.
+
+    ffmpeg demuxes just the audio stream (-vn), so no video frames are
+    decoded and no temp file is written and re-read; speech recognition
+    only needs the PCM anyway.
+    """
     try:
-        with VideoFileClip(video_file) as video:
-            video.audio.write_audiofile(audio_file_path)
-    except Exception as e:
+        proc = subprocess.run(
+            ['ffmpeg', '-loglevel', 'error', '-i', video_file,
+             '-vn', '-ac', '1', '-ar', '16000', '-f', 'wav', 'pipe:1'],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
         logger.error(f"Error extracting audio from video: {e}")
         return None  # Return None if there's an error
-    return audio_file_path
+    return io.BytesIO(proc.stdout)
 
 def get_chat_history(user_id):
-    """Retrieve chat history for a specific user ID."""
-    with app_context():
-        conversations = Conversation.query.filter_by(user_id=user_id).order_by(Conversation.timestamp).all()
-        return conversations if conversations else []  # Return empty list if no conversations
+    """Retrieve chat history rows for a specific user ID.
 
-def create_interface():
+    Selects only the displayed columns as plain rows — no ORM
+    hydration of the TEXT blobs' parent objects — and streams them in
+    batches rather than materializing the whole result set at once.
+    """
+    with app.app_context():
+        try:
+            result = db.session.execute(
+                select(Conversation.id, Conversation.user_input,
+                       Conversation.bot_response, Conversation.timestamp)
+                .where(Conversation.user_id == user_id)
+                .order_by(Conversation.timestamp)
+                .execution_options(yield_per=200))
+            return list(result)
+        finally:
+            db.session.remove()
+
+_INITIALIZED = False
+
+def _ensure_init():
+    """Idempotent startup: create tables, seed predefined characters and
+    warm the response cache exactly once per process. Both __main__ and
+    create_interface used to run (parts of) this, doubling the seed
+    probes on every launch."""
+    global _INITIALIZED
+    if _INITIALIZED:
+        return
+    _INITIALIZED = True
     with app.app_context():
-        add_predefined_characters()  # Add predefined characters if needed
-    
+        db.create_all()
+    add_predefined_characters()
+    _warm_response_cache()
+
+def create_interface():
+    _ensure_init()
+
+    # One query feeds both the admin table and the chat dropdown; the
+    # refresh button re-fetches for both in a single handler.
+    existing_characters = get_existing_characters()
+
     with gr.Blocks(title="Character Chat System", theme=gr.themes.Default()) as iface:
         current_chat_id = gr.State(value=None)  # State to track the current chat ID
         user_id = gr.State(value=None)  # State to track user ID
@@ -255,8 +783,7 @@ def create_interface():
                     
                 with gr.Column():
                     gr.Markdown("## 🌟 Existing Characters 🌟", elem_id="existing_chars_title")
-                    existing_characters = get_existing_characters()
-                    
+
                     character_list = gr.Dataframe(
                         value=existing_characters,
                         headers=["Name", "Description"],
@@ -265,20 +792,18 @@ def create_interface():
                     )
                     
                     refresh_characters_btn = gr.Button("Refresh Character List")
-                    
+
                     def refresh_characters():
-                        return gr.update(value=get_existing_characters())
-                    
-                    refresh_characters_btn.click(
-                        fn=refresh_characters,
-                        outputs=[character_list]
-                    )
+                        _invalidate_character_caches()
+                        chars = get_existing_characters()
+                        return (gr.update(value=chars),
+                                gr.update(choices=[char[0] for char in chars]))
         
         with gr.Tab("Chat with Character"):
             with gr.Row():
                 character_dropdown = gr.Dropdown(
-                    label="Choose Character", 
-                    choices=[char[0] for char in get_existing_characters()],
+                    label="Choose Character",
+                    choices=[char[0] for char in existing_characters],
                     elem_id="character_dropdown"
                 )
                 
@@ -313,32 +838,38 @@ def create_interface():
                     height=300  # Set fixed height for the chat display
                 )
                 
-                def handle_chat(character_name, user_input, audio_file, video_file, user_id, chat_messages):
+                async def handle_chat(character_name, user_input, audio_file, video_file, user_id, chat_messages, chat_id):
                     if audio_file:
-                        user_input = speech_to_text(audio_file)
+                        user_input = await _transcribe(audio_file)
                         if user_input is None:
-                            return chat_messages, None
-                    
+                            yield chat_messages, None
+                            return
+
                     if video_file:
-                        audio_file_path = extract_audio_from_video(video_file)
-                        if audio_file_path is None:  # Check if audio extraction failed
+                        audio_buffer = extract_audio_from_video(video_file)
+                        if audio_buffer is None:  # Check if audio extraction failed
                             chat_messages.append(("Bot", "Failed to extract audio from video. Please try a different file."))
-                            return chat_messages, None
+                            yield chat_messages, None
+                            return
 
-                        extracted_text = speech_to_text(audio_file_path)
+                        extracted_text = await _transcribe(audio_buffer.getvalue())
                         if extracted_text:
                             user_input += f" {extracted_text}"  # Append transcribed text
 
                         chat_messages.append(("User", "Video uploaded"))  # Indicate video upload
 
-                    response, new_chat_id = chat_with_character(character_name, user_input, user_id)
-                    chat_messages.append(("User", user_input))  # Add user message
-                    chat_messages.append(("Bot", response))  # Add bot response
-                    return chat_messages, new_chat_id
+                    # Stream the reply: the last Bot entry is rewritten as
+                    # chunks arrive, so text appears at first-token latency.
+                    chat_messages.append(("User", user_input))
+                    chat_messages.append(("Bot", ""))
+                    new_chat_id = chat_id
+                    async for partial, new_chat_id in chat_with_character_stream(character_name, user_input, user_id, chat_id):
+                        chat_messages[-1] = ("Bot", partial)
+                        yield chat_messages, new_chat_id
                 
                 chat_btn.click(
                     fn=handle_chat,
-                    inputs=[character_dropdown, user_input, audio_input, video_input, user_id, chat_messages],
+                    inputs=[character_dropdown, user_input, audio_input, video_input, user_id, chat_messages, current_chat_id],
                     outputs=[chat_response, current_chat_id]
                 )
         
@@ -366,11 +897,10 @@ def create_interface():
 
                 def check_api_status():
                     try:
-                        response = requests.post(
+                        response = SESSION.post(
                             gemini_api_url,
-                            headers={'Content-Type': 'application/json'},
-                            json={"contents": [{"parts": [{"text": "Hello"}]}]},
-                            params={'key': gemini_api_key}
+                            data=_json_dumps({"contents": [{"parts": [{"text": "Hello"}]}]}),
+                            params=_PARAMS
                         )
                         if response.status_code == 200:
                             return "✅ API connection successful! Gemini API is operational."
@@ -383,14 +913,27 @@ def create_interface():
                     fn=check_api_status,
                     outputs=[api_status_display]
                 )
-    
+
+        # Wired after all tabs exist so the refresh also updates the chat
+        # tab's character dropdown, which previously stayed stale.
+        refresh_characters_btn.click(
+            fn=refresh_characters,
+            outputs=[character_list, character_dropdown]
+        )
+
+        # Populate every character widget from one fetch at page load.
+        def bootstrap_ui():
+            chars = get_existing_characters()
+            return (gr.update(value=chars),
+                    gr.update(choices=[char[0] for char in chars]))
+
+        iface.load(fn=bootstrap_ui, outputs=[character_list, character_dropdown])
+
     return iface
 
 if __name__ == "__main__":
-    with app.app_context():
-        db.create_all()  # Ensure tables are created
-        add_predefined_characters()  # Add predefined characters if needed
-    
+    _ensure_init()
+
     chat_interface = create_interface()
     logger.info("Starting Gradio interface...")
     chat_interface.launch(share=True)